@@ -1,27 +1,31 @@
+import html
 import logging
+import re
 from typing import Tuple
 
-from goose3 import Goose
-from goose3.text import StopWordsArabic, StopWordsKorean, StopWordsChinese
+import trafilatura
+from trafilatura.settings import use_config
 from core.utils import remove_code_from_html
 
 import justext
-from bs4 import BeautifulSoup
+
+# Matches the <title> tag directly; parsing the whole document with BeautifulSoup
+# just to read the title is much more expensive than a single regex scan.
+_title_pattern = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
 
 # This module implements the get_content_and_title() utility function
 # This extracts the most important text from an HTML text segment, trying to reduce the amount of boilerplate text and ad links
-# uses both Goose3 and Justext to get the best of both worlds.
+# uses Trafilatura (a single fast extractor), with Justext as a fallback when Trafilatura comes up empty.
 
-language_stopwords_Goose = {
-    'en': None,  # English stopwords are the default
-    'ar': StopWordsArabic,  # Use Arabic stopwords
-    'zh-cn': StopWordsChinese,  # Use Chinese stopwords
-    'zh-tw': StopWordsChinese,  # Use Chinese stopwords
-    'ko': StopWordsKorean  # Use Korean stopwords
-        }
+# Trafilatura configuration, built once at import time.
+# EXTENSIVE_SEARCH is turned off since that pruning path can add ~200ms per page,
+# and MIN_EXTRACTED_SIZE is lowered so short-but-valid pages don't trigger expensive re-runs.
+_trafilatura_config = use_config()
+_trafilatura_config.set('DEFAULT', 'EXTENSIVE_SEARCH', 'off')
+_trafilatura_config.set('DEFAULT', 'MIN_EXTRACTED_SIZE', '100')
 
-language_stopwords_JusText = {
-    'en': None,  # English stopwords are the default
+# Justext stoplist name for each language code we support.
+_justext_stoplist_names = {
     'ar': 'Arabic',  # Use Arabic stopwords
     'ko': 'Korean' , # Use Korean stopwords
     'ur': 'Urdu' ,  # Use urdu stopwords
@@ -34,7 +38,7 @@ language_stopwords_JusText = {
     'sr': 'Serbian',  # Use Serbian stopwords
     'sq': 'Albanian',  # Use Albanian stopwords
     'es': 'Spanish',  # Use Spanish stopwords
-    'ka': 'Gerogian',  # Use Georgian stopwords
+    'ka': 'Georgian',  # Use Georgian stopwords
     'de': 'German',  # Use German stopwords
     'el': 'Greek',  # Use Greek stopwords
     'ga': 'Irish',  # Use Irish stopwords
@@ -50,10 +54,10 @@ language_stopwords_JusText = {
     'be': 'Belarusian',  # Use Belarusian stopwords
     'ru': 'Russian',  # Use Russian stopwords
     'et': 'Estonian',  # Use Estonian stopwords
-    'uk': 'Ukranian',  # Use Ukranian stopwords
+    'uk': 'Ukrainian',  # Use Ukrainian stopwords
     'ro': 'Romanian',  # Use Romanian stowords
     'cs': 'Czech',  # Use Czech stopwords
-    'ml': 'Malyalam',  # Use Malyalam stopwords
+    'ml': 'Malayalam',  # Use Malayalam stopwords
     'sk': 'Slovak',  # Use Slovak stopwords
     'fi': 'Finnish',  # Use Finnish stopwords
     'da': 'Danish',  # Use Danish stopwords
@@ -68,57 +72,55 @@ language_stopwords_JusText = {
 
 
 
+def _load_justext_stoplists() -> dict:
+    """Load every configured Justext stoplist once, so per-document extraction is a dict lookup instead of a file read."""
+    english = justext.get_stoplist('English')
+    stoplists = {'en': english}
+    for lang, name in _justext_stoplist_names.items():
+        try:
+            stoplists[lang] = justext.get_stoplist(name)
+        except ValueError:
+            logging.info(f"Justext has no stoplist named {name} (language code {lang}); falling back to English")
+            stoplists[lang] = english
+    return stoplists
+
+language_stopwords_JusText = _load_justext_stoplists()
+
 def get_content_with_justext(html_content: str, detected_language: str) -> Tuple[str, str]:
-    if detected_language == 'en':
-        paragraphs = justext.justext(html_content, justext.get_stoplist("English")) 
-    else:
-        stopwords_keyword = language_stopwords_JusText.get(detected_language, 'English')
-        # Extract paragraphs using the selected stoplist
-        paragraphs = justext.justext(html_content, justext.get_stoplist(stopwords_keyword))
+    # Extract paragraphs using the preloaded stoplist for the detected language
+    stoplist = language_stopwords_JusText.get(detected_language, language_stopwords_JusText['en'])
+    paragraphs = justext.justext(html_content, stoplist)
 
     text = '\n'.join([p.text for p in paragraphs if not p.is_boilerplate])
-    soup = BeautifulSoup(html_content, 'html.parser')
-    stitle = soup.find('title')
-    if stitle:
-        title = stitle.text
+    match = _title_pattern.search(html_content)
+    if match:
+        title = html.unescape(match.group(1)).strip()
     else:
         title = 'No title'
     return text, title
 
-def get_content_with_goose3(html_content: str, url: str, detected_language: str) -> Tuple[str, str]:
-    try:
-        if detected_language in language_stopwords_Goose:
-            stopwords_class = language_stopwords_Goose.get(detected_language, None)
-            
-            if stopwords_class is not None:
-                g = Goose({'stopwords_class': stopwords_class})
-            else:
-                g = Goose()  # Use the default stopwords for languages that don't have a configured StopWords class
-
-            article = g.extract(url=url, raw_html=html_content)
-            title = article.title
-            text = article.cleaned_text
-            return text, title
-        else:
-            title = ""
-            text = ""
-            logging.info(f"The language with code {detected_language} is not supported by Goose")
-            return text, title
-    except Exception as e:
-        title = ""
-        text = ""
-        logging.info(f"Error in Goose3 ({e}); that's okay Justext will fill in")
-        return text, title
-
 def get_content_and_title(html_content: str, url: str, detected_language: str, remove_code: bool = False) -> Tuple[str, str]:
     if remove_code:
         html_content = remove_code_from_html(html_content)
 
-    text1, title1 = get_content_with_goose3(html_content, url, detected_language)
-    text2, title2 = get_content_with_justext(html_content, detected_language)
-    
-    # both Goose and Justext do extraction without boilerplate; return the one that produces the longest text, trying to optimize for content
-    if len(text1)>len(text2):
-        return text1, title1
-    else:
-        return text2, title2
+    try:
+        text = trafilatura.extract(html_content, url=url, config=_trafilatura_config,
+                                   include_comments=False, favor_precision=True, no_fallback=True)
+        metadata = trafilatura.extract_metadata(html_content, default_url=url)
+        title = metadata.title if metadata and metadata.title else None
+    except Exception as e:
+        text = title = None
+        logging.info(f"Error in Trafilatura ({e}); that's okay Justext will fill in")
+
+    # Fall back to Justext only when Trafilatura fails to extract anything, and only for
+    # languages we have a Justext stoplist for; running Justext with English stopwords on
+    # any other language pays a full HTML parse just to misclassify most paragraphs.
+    if (text is None or len(text) == 0) and detected_language in language_stopwords_JusText:
+        text, justext_title = get_content_with_justext(html_content, detected_language)
+        if title is None:
+            title = justext_title
+    if text is None:
+        text = ''
+    if title is None:
+        title = 'No title'
+    return text, title
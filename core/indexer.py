@@ -1,7 +1,11 @@
 import logging
 import json
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from typing import Tuple, Dict, Any, List, Optional
+from urllib.parse import urlparse
 
 import time
 from slugify import slugify
@@ -9,11 +13,12 @@ from slugify import slugify
 from bs4 import BeautifulSoup
 
 from omegaconf import OmegaConf
-from nbconvert import HTMLExporter      # type: ignore
-import nbformat
 import markdown
 import docutils.core
 
+import diskcache
+import orjson
+
 from core.utils import html_to_text, detect_language, get_file_size_in_MB, create_session_with_retries
 from core.extract import get_content_and_title
 
@@ -30,6 +35,33 @@ get_headers = {
     "Connection": "keep-alive",
 }
 
+# resource types that are unnecessary for text extraction; blocking them saves bandwidth and render time
+blocked_resource_types = {"image", "media", "font", "stylesheet"}
+
+def block_heavy_resources(route) -> None:
+    if route.request.resource_type in blocked_resource_types:
+        route.abort()
+    else:
+        route.continue_()
+
+def split_elements(elements: List[Any]) -> Tuple[List[str], str]:
+    """
+    Split the elements returned by partition() into body texts and a document title,
+    in a single pass (each element is stringified exactly once).
+    The title is the first Title element longer than 20 characters, or 'unknown'.
+    """
+    texts: List[str] = []
+    extracted_title = 'unknown'
+    Title = us.documents.elements.Title     # local alias avoids the attribute chain lookup per element
+    for element in elements:
+        text = str(element)
+        if isinstance(element, Title):
+            if extracted_title == 'unknown' and len(text) > 20:
+                extracted_title = text
+        else:
+            texts.append(text)
+    return texts, extracted_title
+
 class Indexer(object):
     """
     Vectara API class.
@@ -48,7 +80,13 @@ class Indexer(object):
         self.reindex = reindex
         self.remove_code = remove_code
         self.timeout = cfg.vectara.get("timeout", 60)
-        self.detected_language: Optional[str] = None
+        self.jsonly_domains = list(cfg.vectara.get("jsonly_domains", []))   # domains that always need browser rendering
+        self.detected_languages: Dict[str, str] = {}    # language detected per domain
+
+        # Optional on-disk cache of ETag/Last-Modified validators per URL; when configured,
+        # re-crawls issue conditional GETs and skip Playwright + extraction for unchanged pages.
+        cache_dir = cfg.vectara.get("cache_dir", None)
+        self.cache = diskcache.Cache(cache_dir) if cache_dir else None
 
         self.setup()
 
@@ -57,27 +95,25 @@ class Indexer(object):
         # Create playwright browser so we can reuse it across all Indexer operations
         self.p = sync_playwright().start()
         self.browser = self.p.firefox.launch(headless=True)
+        self._create_context_pool()
 
-    def url_triggers_download(self, url: str) -> bool:
-        download_triggered = False
+    def _new_context(self):
+        """Create a browser context with our headers and resource-blocking route pre-installed."""
         context = self.browser.new_context()
+        context.set_extra_http_headers(get_headers)
+        context.route("**/*", block_heavy_resources)
+        return context
 
-        # Define the event listener for download
-        def on_download(download):
-            nonlocal download_triggered
-            download_triggered = True
-
-        page = context.new_page()
-        page.set_extra_http_headers(get_headers)
-        page.on('download', on_download)
-        try:
-            page.goto(url, wait_until="domcontentloaded")
-        except Exception as e:
-            pass
-
-        page.close()
-        context.close()
-        return download_triggered
+    def _create_context_pool(self):
+        """
+        Pre-create a small pool of browser contexts to be reused across URLs.
+        Creating a context is ~100-300ms of fixed overhead (fresh cookie jar, routes), so
+        reusing a few of them amortizes that cost across the whole crawl.
+        """
+        pool_size = self.cfg.vectara.get("playwright_pool_size", 4)
+        self._ctx_pool: Optional[queue.Queue] = queue.Queue()
+        for _ in range(pool_size):
+            self._ctx_pool.put(self._new_context())
 
     def fetch_page_contents(self, url: str, debug: bool = False) -> Tuple[str, str, List[str]]:
         '''
@@ -88,18 +124,13 @@ class Indexer(object):
         Returns:
             content, actual url, list of links
         '''
-        page = context = None
+        page = None
         content = ''
         links = []
         out_url = url
+        context = self._ctx_pool.get()
         try:
-            context = self.browser.new_context()
             page = context.new_page()
-            page.set_extra_http_headers(get_headers)
-            page.route("**/*", lambda route: route.abort()  # do not load images as they are unnecessary for our purpose
-                if route.request.resource_type == "image" 
-                else route.continue_() 
-            ) 
             if debug:
                 page.on('console', lambda msg: logging.info(f"playwright debug: {msg.text})"))
 
@@ -115,12 +146,17 @@ class Indexer(object):
             logging.info(f"Page loading failed for {url} with exception '{e}'")
             if not self.browser.is_connected():
                 self.browser = self.p.firefox.launch(headless=True)
+                self._create_context_pool()     # contexts from the old browser are dead
+                context = None
         finally:
             if page:
-                page.close()
-            if context:
-                context.close()
-            
+                try:
+                    page.close()
+                except Exception:
+                    pass
+            if context is not None:
+                self._ctx_pool.put(context)     # return the context to the pool for reuse
+
         return content, out_url, links
 
     # delete document; returns True if successful, False otherwise
@@ -138,7 +174,7 @@ class Indexer(object):
         body = {'customer_id': self.customer_id, 'corpus_id': self.corpus_id, 'document_id': doc_id}
         post_headers = { 'x-api-key': self.api_key, 'customer-id': str(self.customer_id) }
         response = self.session.post(
-            f"https://{self.endpoint}/v1/delete-doc", data=json.dumps(body),
+            f"https://{self.endpoint}/v1/delete-doc", data=orjson.dumps(body),
             verify=True, headers=post_headers)
         
         if response.status_code != 200:
@@ -211,7 +247,7 @@ class Indexer(object):
             'customer-id': str(self.customer_id),
         }
         try:
-            data = json.dumps(request)
+            data = orjson.dumps(request)
         except Exception as e:
             logging.info(f"Can't serialize request {request}, skipping")   
             return False
@@ -236,7 +272,7 @@ class Indexer(object):
             if self.reindex:
                 logging.info(f"Document {document['documentId']} already exists, re-indexing")
                 self.delete_doc(document['documentId'])
-                response = self.session.post(api_endpoint, data=json.dumps(request), verify=True, headers=post_headers)
+                response = self.session.post(api_endpoint, data=data, verify=True, headers=post_headers)
                 return True
             else:
                 logging.info(f"Document {document['documentId']} already exists, skipping")
@@ -248,6 +284,18 @@ class Indexer(object):
         return False
     
 
+    def _needs_js(self, url: str, html_bytes: bytes) -> bool:
+        """
+        Heuristic for whether a page has to be rendered in a browser: domains listed in
+        vectara.jsonly_domains are always rendered, and tiny responses are likely SPA shells
+        that fill in their content with javascript. Everything else can be extracted from
+        the raw HTML, which is ~10x faster than a headless-browser round trip.
+        """
+        domain = urlparse(url).netloc
+        if any(d in domain for d in self.jsonly_domains):
+            return True
+        return len(html_bytes) < 2048
+
     def index_url(self, url: str, metadata: Dict[str, Any]) -> bool:
         """
         Index a url by rendering it with scrapy-playwright, extracting paragraphs, then uploading to the Vectara corpus.
@@ -260,65 +308,128 @@ class Indexer(object):
         st = time.time()
         url = url.split("#")[0]     # remove fragment, if exists
 
-        if self.url_triggers_download(url):
-            file_path = 'tmpfile'
-            response = self.session.get(url, stream=True)
+        # A single GET both classifies the URL (by its response headers) and provides the body for
+        # file parsing, replacing the Playwright download probe followed by a second full download.
+        is_download = False
+        response = None
+        req_headers = get_headers
+        cache_key = url     # key validators by the requested URL; 'url' may later become the post-redirect URL
+        cached_validators = self.cache.get(cache_key) if self.cache is not None else None
+        if cached_validators:
+            req_headers = dict(get_headers)
+            if cached_validators.get('etag'):
+                req_headers['If-None-Match'] = cached_validators['etag']
+            if cached_validators.get('last_modified'):
+                req_headers['If-Modified-Since'] = cached_validators['last_modified']
+        try:
+            response = self.session.get(url, headers=req_headers, stream=True, timeout=self.timeout)
+            if response.status_code == 304:
+                logging.info(f"{url} is unchanged since the last crawl, skipping")
+                return True
             if response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192): 
-                        f.write(chunk)
-                logging.info(f"File downloaded successfully and saved as {file_path}")
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                content_disposition = response.headers.get("Content-Disposition", "").lower()
+                is_download = "attachment" in content_disposition or \
+                              content_type not in ("text/html", "application/xhtml+xml", "")
             else:
-                logging.info(f"Failed to download file. Status code: {response.status_code}")
-                return False
-            # parse downloaded file
-            if url.endswith(".pdf"):
+                logging.info(f"Direct GET of {url} returned status code {response.status_code}")
+        except Exception as e:
+            logging.info(f"Direct GET of {url} failed with error {e}")
+
+        if is_download:
+            # parse downloaded content directly from memory, without a temporary file on disk
+            if url.endswith(".pdf") or content_type == "application/pdf":
                 try:
-                    elements = partition(file_path)
-                    parts = [str(t) for t in elements if type(t)!=us.documents.elements.Title]
-                    titles = [str(x) for x in elements if type(x)==us.documents.elements.Title and len(str(x))>20]
-                    extracted_title = titles[0] if len(titles)>0 else 'unknown'
+                    elements = partition(file=BytesIO(response.content))
+                    parts, extracted_title = split_elements(elements)
                 except Exception as e:
                     logging.info(f"Failed to crawl {url} to get PDF content with error {e}, skipping...")
                     return False
 
             # If MD, RST of IPYNB file, then we don't need playwright - can just download content directly and convert to text
             elif url.endswith(".md") or url.endswith(".rst") or url.lower().endswith(".ipynb"):
-                dl_content = content.decode('utf-8')
+                dl_content = response.content.decode('utf-8')
                 if url.endswith('rst'):
                     html_content = docutils.core.publish_string(dl_content, writer_name='html')
+                    text = html_to_text(html_content, self.remove_code)
                 elif url.endswith('md'):
                     html_content = markdown.markdown(dl_content)
+                    text = html_to_text(html_content, self.remove_code)
                 elif url.lower().endswith('ipynb'):
-                    nb = nbformat.reads(dl_content, nbformat.NO_CONVERT)    # type: ignore
-                    exporter = HTMLExporter()
-                    html_content, _ = exporter.from_notebook_node(nb)
+                    # read the cell sources straight out of the notebook JSON; rendering with
+                    # HTMLExporter just to strip the HTML back to text pays jinja template
+                    # initialization plus a full HTML build and parse per notebook
+                    nb = json.loads(dl_content)
+                    sources = []
+                    for cell in nb.get('cells', []):
+                        cell_type = cell.get('cell_type')
+                        if cell_type != 'markdown' and (cell_type != 'code' or self.remove_code):
+                            continue
+                        source = cell.get('source', '')
+                        sources.append(''.join(source) if isinstance(source, list) else source)
+                    text = '\n\n'.join(sources)
                 extracted_title = url.split('/')[-1]      # no title in these files, so using file name
-                text = html_to_text(html_content, self.remove_code)
-                parts = [text]            
+                parts = [text]
 
-        else:
+            else:
+                # not a file type we parse directly (e.g. text/plain, xml or json payloads);
+                # send it through the regular page path, which renders it like a browser would
+                is_download = False
+
+        if not is_download:
             try:
-                content, actual_url, _ = self.fetch_page_contents(url)
+                content = ''
+                actual_url = url
+                rendered = False
+                if response is not None and response.status_code == 200:
+                    if self._needs_js(response.url, response.content):
+                        response.close()
+                    else:
+                        # static page: the raw HTML is enough, skip the browser round trip entirely.
+                        # requests defaults to ISO-8859-1 when the Content-Type header carries no
+                        # charset and ignores <meta charset>, so sniff the encoding in that case
+                        if 'charset' not in response.headers.get('Content-Type', '').lower():
+                            response.encoding = response.apparent_encoding
+                        content = response.text
+                        actual_url = response.url
+                if len(content) < 3:
+                    content, actual_url, _ = self.fetch_page_contents(url)
+                    rendered = True
                 if content is None or len(content)<3:
                     return False
-                if self.detected_language is None:
+                # detect language once per domain; different sites in the same crawl may use different languages
+                domain = urlparse(actual_url).netloc
+                detected_language = self.detected_languages.get(domain)
+                if detected_language is None:
                     soup = BeautifulSoup(content, 'html.parser')
-                    body_text = soup.body.get_text()
-                    self.detected_language = detect_language(body_text)
-                    logging.info(f"The detected language is {self.detected_language}")
+                    body_text = soup.body.get_text() if soup.body else soup.get_text()
+                    detected_language = detect_language(body_text)
+                    self.detected_languages[domain] = detected_language
+                    logging.info(f"The detected language for {domain} is {detected_language}")
                 url = actual_url
-                text, extracted_title = get_content_and_title(content, url, self.detected_language, self.remove_code)
+                text, extracted_title = get_content_and_title(content, url, detected_language, self.remove_code)
+                if len(text) == 0 and not rendered:
+                    # the raw HTML had markup but no extractable text - likely a JS-driven SPA
+                    # shell that passed the size heuristic; retry with a full browser render
+                    content, actual_url, _ = self.fetch_page_contents(url)
+                    if content is None or len(content)<3:
+                        return False
+                    url = actual_url
+                    text, extracted_title = get_content_and_title(content, url, detected_language, self.remove_code)
                 parts = [text]
                 logging.info(f"retrieving content took {time.time()-st:.2f} seconds")
             except Exception as e:
                 import traceback
                 logging.info(f"Failed to crawl {url}, skipping due to error {e}, traceback={traceback.format_exc()}")
                 return False
-        
+
         doc_id = slugify(url)
         succeeded = self.index_segments(doc_id=doc_id, texts=parts,
                                         doc_metadata=metadata, doc_title=extracted_title)
+        if succeeded and self.cache is not None and response is not None and response.status_code == 200:
+            validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+            if validators['etag'] or validators['last_modified']:
+                self.cache.set(cache_key, validators)
         return succeeded
 
     def index_segments(self, doc_id: str, texts: List[str], titles: Optional[List[str]] = None, metadatas: Optional[List[Dict[str, Any]]] = None, 
@@ -335,9 +446,9 @@ class Indexer(object):
         document["documentId"] = doc_id
         if doc_title is not None and len(doc_title)>0:
             document["title"] = doc_title
-        document["section"] = [{"text": text, "title": title, "metadataJson": json.dumps(md)} for text,title,md in zip(texts,titles,metadatas)]  # type: ignore
+        document["section"] = [{"text": text, "title": title, "metadataJson": orjson.dumps(md).decode()} for text,title,md in zip(texts,titles,metadatas)]  # type: ignore
         if doc_metadata:
-            document["metadataJson"] = json.dumps(doc_metadata)
+            document["metadataJson"] = orjson.dumps(doc_metadata).decode()
         return self.index_document(document)
 
     def index_document(self, document: Dict[str, Any]) -> bool:
@@ -347,6 +458,19 @@ class Indexer(object):
         """
         return self._index_document(document)
 
+    def index_documents(self, documents: List[Dict[str, Any]], max_workers: int = 8) -> List[bool]:
+        """
+        Index a batch of documents into the Vectara corpus.
+        The indexing API accepts one document per request, so batching here means pipelining
+        the POSTs concurrently over the session's keep-alive connection pool instead of paying
+        one network round-trip of latency per document.
+        Returns a list of booleans, one per document, in the same order.
+        """
+        if len(documents) <= 1:
+            return [self._index_document(document) for document in documents]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(documents))) as executor:
+            return list(executor.map(self._index_document, documents))
+
     def index_file(self, filename: str, uri: str, metadata: Dict[str, Any]) -> bool:
         """
         Index a file on local file system by uploading it to the Vectara corpus.
@@ -364,9 +488,7 @@ class Indexer(object):
         # if file size is more than 50MB, then we extract the text locally and send over with standard API
         if filename.endswith(".pdf") and get_file_size_in_MB(filename) > 50:
             elements = partition(filename)
-            texts = [str(t) for t in elements if type(t)!=us.documents.elements.Title]
-            titles = [str(x) for x in elements if type(x)==us.documents.elements.Title and len(str(x))>20]
-            title = titles[0] if len(titles)>0 else 'unknown'
+            texts, title = split_elements(elements)
             succeeded = self.index_segments(doc_id=slugify(filename), texts=texts,
                                             doc_metadata=metadata, doc_title=title)
             logging.info(f"For file {filename}, indexing text only since file size is larger than 50MB")
@@ -1,6 +1,7 @@
 from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 import requests
-from urllib.parse import urlparse, urlunparse, ParseResult
+from urllib.parse import urlparse, urlunparse
 import re
 from langdetect import detect
 from typing import List, Set
@@ -19,16 +20,17 @@ def remove_code_from_html(html_text: str) -> str:
     return str(soup)
 
 def html_to_text(html: str, include_code: bool = True) -> str:
-    """Convert HTML to text."""
+    """Convert HTML to text; selectolax is much faster than BeautifulSoup for plain text extraction."""
+    tree = HTMLParser(html)
     if not include_code:
-        html = remove_code_from_html(html)
-    soup = BeautifulSoup(html, features='html.parser')
-    return soup.get_text()
+        for tag in tree.css('code,script'):
+            tag.decompose()
+    return tree.text()
 
 def create_session_with_retries(retries: int = 3) -> requests.Session:
-    """Create a requests session with retries."""
+    """Create a requests session with retries and a keep-alive tuned connection pool."""
     session = requests.Session()
-    adapter = requests.adapters.HTTPAdapter(max_retries=retries)
+    adapter = requests.adapters.HTTPAdapter(max_retries=retries, pool_connections=32, pool_maxsize=32)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
     return session
@@ -39,30 +41,38 @@ def remove_anchor(url: str) -> str:
     url_without_anchor = urlunparse(parsed._replace(fragment=""))
     return url_without_anchor
 
+_www_pattern = re.compile(r'^www\.')
+
 def normalize_url(url: str) -> str:
-    """Normalize a URL by removing query parameters."""    
+    """Normalize a URL by removing the 'www' prefix and query parameters."""
     # Prepend with 'http://' if URL has no scheme
     if '://' not in url:
         url = 'http://' + url
     p = urlparse(url)
-        
+
     # Remove query parameters
     path = p.path.split('?', 1)[0]
 
-    # Reconstruct URL with scheme, without 'www', and query parameters
-    return ParseResult(p.scheme, p.netloc, path, '', '', '').geturl()
+    # Reconstruct URL with scheme, without 'www', and without query parameters;
+    # direct string construction skips the ParseResult.geturl() overhead, which adds
+    # up over the tens of thousands of URLs normalized in a large crawl
+    return f"{p.scheme}://{_www_pattern.sub('', p.netloc)}{path}"
 
 def clean_urls(urls: Set[str]) -> List[str]:
-    return list(set(normalize_url(url) for url in urls))
+    return list({normalize_url(url) for url in urls})
+
+_angles_pattern = re.compile(r"[<>]+", re.MULTILINE)
 
 def clean_email_text(text: str) -> str:
     """
     Clean the text email by removing any unnecessary characters and indentation.
     This function can be extended to clean emails in other ways.
-    """    
-    cleaned_text = text.strip()
-    cleaned_text = re.sub(r"[<>]+", "", cleaned_text, flags=re.MULTILINE)
-    return cleaned_text
+    """
+    return _angles_pattern.sub("", text.strip())
+
+def clean_email_texts(texts: List[str]) -> List[str]:
+    """Clean a batch of email texts with a single pass over the precompiled pattern."""
+    return [_angles_pattern.sub("", text.strip()) for text in texts]
 
 def detect_language(text: str) -> str:
     try:
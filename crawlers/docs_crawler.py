@@ -134,7 +134,7 @@ class DocsCrawler(Crawler):
             ray_workers = psutil.cpu_count(logical=True)
         if ray_workers > 0:
             logging.info(f"Using {ray_workers} ray workers")
-            self.indexer.p = self.indexer.browser = None
+            self.indexer.p = self.indexer.browser = self.indexer._ctx_pool = None
             ray.init(num_cpus=ray_workers, log_to_driver=True)
             actors = [ray.remote(UrlCrawlWorker).remote(self.indexer) for _ in range(ray_workers)]
             for a in actors:
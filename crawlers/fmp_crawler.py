@@ -1,16 +1,42 @@
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from omegaconf import OmegaConf, DictConfig
 
 from core.crawler import Crawler
+from core.indexer import Indexer
 from core.utils import create_session_with_retries
 
+import ray
+import psutil
+
+class TickerCrawlWorker(object):
+    def __init__(self, indexer: Indexer, crawler: Crawler):
+        self.crawler = crawler
+        self.indexer = indexer
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+
+    def setup(self):
+        self.indexer.setup()
+
+    def process(self, ticker: str):
+        try:
+            self.crawler.process_ticker(ticker)
+        except Exception as e:
+            import traceback
+            self.logger.error(
+                f"Error while processing {ticker}: {e}, traceback={traceback.format_exc()}"
+            )
+            return -1
+        return 0
+
 # Crawler for financial information using the financialmodelingprep.com service
 # To use this crawler you have to have an fmp API_key in your secrets.toml profile
 class FmpCrawler(Crawler):
-    
+
     def __init__(self, cfg: OmegaConf, endpoint: str, customer_id: str, corpus_id: int, api_key: str) -> None:
         super().__init__(cfg, endpoint, customer_id, corpus_id, api_key)
         cfg_dict: DictConfig = DictConfig(cfg)
@@ -20,93 +46,122 @@ class FmpCrawler(Crawler):
         self.api_key = cfg_dict.fmp_crawler.fmp_api_key
         self.session = create_session_with_retries()
 
-    def index_doc(self, document: Dict[str, Any]) -> bool:
+    def index_docs(self, documents: List[Dict[str, Any]]) -> None:
         try:
-            succeeded = self.indexer.index_document(document)
+            results = self.indexer.index_documents(documents)
+        except Exception as e:
+            logging.info(f"Error during indexing: {e}")
+            return
+        for document, succeeded in zip(documents, results):
             if succeeded:
                 logging.info(f"Indexed {document['documentId']}")
             else:
                 logging.info(f"Error indexing issue {document['documentId']}")
-            return succeeded
+
+    def _get(self, url: str) -> Optional[Any]:
+        try:
+            return self.session.get(url)
         except Exception as e:
-            logging.info(f"Error during indexing of {document['documentId']}: {e}")
-            return False
+            logging.info(f"Error fetching {url}: {e}")
+            return None
 
-    def crawl(self) -> None:
+    def process_ticker(self, ticker: str) -> None:
         base_url = 'https://financialmodelingprep.com'
-        for ticker in self.tickers:
-            # get profile
-            url = f'{base_url}/api/v3/profile/{ticker}?apikey={self.api_key}'
-            try:
-                response = self.session.get(url)
-            except Exception as e:
-                logging.info(f"Error getting transcript for {ticker}: {e}")
-                continue
-            if response.status_code == 200:
+        documents: List[Dict[str, Any]] = []    # collected per ticker, then indexed as one pipelined batch
+        # get profile
+        url = f'{base_url}/api/v3/profile/{ticker}?apikey={self.api_key}'
+        response = self._get(url)
+        if response is None:
+            return
+        if response.status_code == 200:
+            data = response.json()
+            company_name = data[0]['companyName']
+            logging.info(f"Processing {company_name}")
+        else:
+            logging.info(f"Can't get company profile for {ticker} - skipping")
+            return
+
+        # index 10-K for ticker in date range
+        url = f'{base_url}/api/v3/sec_filings/{ticker}?type=10-K&page=0&apikey={self.api_key}'
+        filings = self.session.get(url).json()
+
+        # fetch each API path as its own tiled batch: all the report fetches together, then all
+        # the transcript fetches, fanned out over the session's keep-alive connection pool
+        years = list(range(self.start_year, self.end_year+1))
+        report_urls = [f'{base_url}/api/v4/financial-reports-json?symbol={ticker}&year={year}&period=FY&apikey={self.api_key}'
+                       for year in years]
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            report_responses = list(executor.map(self._get, report_urls))
+        for year, response in zip(years, report_responses):
+            if response is not None and response.status_code == 200:
                 data = response.json()
-                company_name = data[0]['companyName']
-                logging.info(f"Processing {company_name}")
-            else:
-                logging.info(f"Can't get company profile for {ticker} - skipping")
-                continue
-
-            # index 10-K for ticker in date range
-            url = f'{base_url}/api/v3/sec_filings/{ticker}?type=10-K&page=0&apikey={self.api_key}'
-            filings = self.session.get(url).json()
-            for year in range(self.start_year, self.end_year+1):
-                url = f'{base_url}/api/v4/financial-reports-json?symbol={ticker}&year={year}&period=FY&apikey={self.api_key}'
-                try:
-                    response = self.session.get(url)
-                except Exception as e:
-                    logging.info(f"Error getting transcript for {ticker}: {e}")
-                    continue
-                if response.status_code == 200:
-                    data = response.json()
-                    doc_title = f"10-K for {company_name} from {year}"
-                    rel_filings = [f for f in filings if f['acceptedDate'][:4] == str(year)]
-                    url = rel_filings[0]['finalLink'] if len(rel_filings)>0 else None
-                    metadata = {'source': ticker.lower(), 'title': doc_title, 'ticker': ticker, 'company name': company_name, 'year': year, 'type': '10-K', 'url': url}
-                    document: Dict[str, Any] = {
-                        "documentId": f"10-K-{company_name}-{year}",
-                        "title": doc_title,
-                        "metadataJson": json.dumps(metadata),
-                        "section": []
-                    }
-                    for key in data.keys():
-                        if type(data[key])==str:
-                            continue
-                        # data[key] is a list of dicts
-                        for item_dict in data[key]:
-                            for title, values in item_dict.items():
-                                values = [v for v in values if v and type(v)==str and len(v)>=50]
-                                text = '\n'.join(values)
-                                if len(values)>0 and len(text)>100:
-                                    document['section'].append({'title': title, 'text': text})
-                    if len(document['section'])>0:
-                        self.index_doc(document)
-
-            # Index earnings call transcript
-            logging.info(f"Getting transcripts")
-            for year in range(self.start_year, self.end_year+1):
-                for quarter in range(1, 5):
-                    url = f'{base_url}/api/v3/earning_call_transcript/{ticker}?quarter={quarter}&year={year}&apikey={self.api_key}'
-                    try:
-                        response = self.session.get(url)
-                    except Exception as e:
-                        logging.info(f"Error getting transcript for {company_name} quarter {quarter} of {year}: {e}")
+                doc_title = f"10-K for {company_name} from {year}"
+                rel_filings = [f for f in filings if f['acceptedDate'][:4] == str(year)]
+                url = rel_filings[0]['finalLink'] if len(rel_filings)>0 else None
+                metadata = {'source': ticker.lower(), 'title': doc_title, 'ticker': ticker, 'company name': company_name, 'year': year, 'type': '10-K', 'url': url}
+                document: Dict[str, Any] = {
+                    "documentId": f"10-K-{company_name}-{year}",
+                    "title": doc_title,
+                    "metadataJson": json.dumps(metadata),
+                    "section": []
+                }
+                for key_data in data.values():
+                    if isinstance(key_data, str):
                         continue
-                    if response.status_code == 200:
-                        for transcript in response.json():
-                            title = f"Earnings call transcript for {company_name}, quarter {quarter} of {year}"
-                            metadata = {'source': ticker.lower(), 'title': title, 'ticker': ticker, 'company name': company_name, 'year': year, 'quarter': quarter, 'type': 'transcript'}
-                            document = {
-                                "documentId": f"transcript-{company_name}-{year}-{quarter}",
-                                "title": title,
-                                "metadataJson": json.dumps(metadata),
-                                "section": [
-                                    {
-                                        'text': transcript['content']
-                                    }
-                                ]
+                    # each value is a list of dicts
+                    for item_dict in key_data:
+                        for title, values in item_dict.items():
+                            values = [v for v in values if v and isinstance(v, str) and len(v)>=50]
+                            text = '\n'.join(values)
+                            if len(values)>0 and len(text)>100:
+                                document['section'].append({'title': title, 'text': text})
+                if len(document['section'])>0:
+                    documents.append(document)
+
+        # Index earnings call transcript
+        logging.info(f"Getting transcripts")
+        year_quarters = [(year, quarter) for year in years for quarter in range(1, 5)]
+        transcript_urls = [f'{base_url}/api/v3/earning_call_transcript/{ticker}?quarter={quarter}&year={year}&apikey={self.api_key}'
+                           for year, quarter in year_quarters]
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            transcript_responses = list(executor.map(self._get, transcript_urls))
+        for (year, quarter), response in zip(year_quarters, transcript_responses):
+            if response is not None and response.status_code == 200:
+                for transcript in response.json():
+                    title = f"Earnings call transcript for {company_name}, quarter {quarter} of {year}"
+                    metadata = {'source': ticker.lower(), 'title': title, 'ticker': ticker, 'company name': company_name, 'year': year, 'quarter': quarter, 'type': 'transcript'}
+                    document = {
+                        "documentId": f"transcript-{company_name}-{year}-{quarter}",
+                        "title": title,
+                        "metadataJson": json.dumps(metadata),
+                        "section": [
+                            {
+                                'text': transcript['content']
                             }
-                            self.index_doc(document)
+                        ]
+                    }
+                    documents.append(document)
+
+        if len(documents)>0:
+            self.index_docs(documents)
+
+    def crawl(self) -> None:
+        ray_workers = self.cfg.fmp_crawler.get("ray_workers", 0)            # -1: use ray with ALL cores, 0: dont use ray
+        if ray_workers == -1:
+            ray_workers = psutil.cpu_count(logical=True)
+
+        # Each ticker is an independent sequence of HTTP fetches, so crawling tickers
+        # in parallel is the biggest wall-clock win for this crawler.
+        if ray_workers > 0:
+            logging.info(f"Using {ray_workers} ray workers")
+            self.indexer.p = self.indexer.browser = self.indexer._ctx_pool = None
+            ray.init(num_cpus=ray_workers, log_to_driver=True)
+            actors = [ray.remote(TickerCrawlWorker).remote(self.indexer, self) for _ in range(ray_workers)]
+            for a in actors:
+                a.setup.remote()
+            pool = ray.util.ActorPool(actors)
+            _ = list(pool.map(lambda a, t: a.process.remote(t), self.tickers))
+        else:
+            crawl_worker = TickerCrawlWorker(self.indexer, self)
+            for ticker in self.tickers:
+                crawl_worker.process(ticker)
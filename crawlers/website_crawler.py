@@ -119,7 +119,7 @@ class WebsiteCrawler(Crawler):
 
         if ray_workers > 0:
             logging.info(f"Using {ray_workers} ray workers")
-            self.indexer.p = self.indexer.browser = None
+            self.indexer.p = self.indexer.browser = self.indexer._ctx_pool = None
             ray.init(num_cpus=ray_workers, log_to_driver=True)
             actors = [ray.remote(PageCrawlWorker).remote(self.indexer, self) for _ in range(ray_workers)]
             for a in actors: